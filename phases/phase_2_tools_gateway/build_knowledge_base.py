@@ -0,0 +1,58 @@
+"""
+Build or refresh the local knowledge base used by the Phase 2 runtimes.
+
+Index a folder of architecture notes (.md / .txt). Re-running only tokenises new
+or changed files; use --rebuild to start from scratch:
+
+    python build_knowledge_base.py index ./notes --out knowledge_base
+
+Try a query against the index:
+
+    python build_knowledge_base.py search "cross-Region DR for Aurora" --out knowledge_base
+"""
+
+import argparse
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from knowledge_base import TOP_K, KnowledgeBase, index_folder
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    default_out = Path(__file__).parent / "knowledge_base"
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    idx = sub.add_parser("index", help="index (or re-index) a folder of notes")
+    idx.add_argument("notes", type=Path)
+    idx.add_argument("--out", type=Path, default=default_out)
+    idx.add_argument("--rebuild", action="store_true", help="drop the existing index first")
+
+    search = sub.add_parser("search", help="run a top-k query against the index")
+    search.add_argument("query")
+    search.add_argument("--out", type=Path, default=default_out)
+    search.add_argument("-k", type=int, default=TOP_K)
+
+    args = parser.parse_args(argv)
+    if args.command == "index":
+        started = time.perf_counter()
+        stats = index_folder(str(args.notes), str(args.out), rebuild=args.rebuild)
+        elapsed = time.perf_counter() - started
+        print(
+            f"Indexed {args.notes} -> {args.out} in {elapsed:.1f}s: "
+            + ", ".join(f"{key}={value}" for key, value in stats.items())
+        )
+        return
+
+    kb = KnowledgeBase(str(args.out))
+    started = time.perf_counter()
+    hits = kb.search(args.query, args.k)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"{len(hits)} hit(s) over {len(kb)} chunks in {elapsed_ms:.2f} ms")
+    for score, source, text in hits:
+        print(f"\n{score:.3f}  {source}\n  {text[:300]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Offline pipeline that pre-generates the SA Pro practice-scenario bank.
+
+Step 1 – generate scenarios with the tutor model for every (domain, service)
+pair and append them to a JSONL file (safe to re-run; finished pairs are skipped):
+
+    python build_question_bank.py generate --out scenarios.jsonl --per-pair 5 --workers 4
+
+Step 2 – de-duplicate and pack the JSONL into the memory-mapped bank that the
+Phase 2 runtimes serve from (see question_bank.py):
+
+    python build_question_bank.py pack scenarios.jsonl --out question_bank.saqb
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from question_bank import write_bank
+
+BEDROCK_MODEL_ID = "us.amazon.nova-2-lite-v1:0"  # Same model as the runtimes
+
+# SAP-C02 exam domains
+DOMAINS = [
+    "Design Solutions for Organizational Complexity",
+    "Design for New Solutions",
+    "Continuous Improvement for Existing Solutions",
+    "Accelerate Workload Migration and Modernization",
+]
+
+SERVICES = [
+    "AWS Organizations",
+    "AWS Control Tower",
+    "IAM",
+    "AWS Transit Gateway",
+    "AWS Direct Connect",
+    "Site-to-Site VPN",
+    "Amazon Route 53",
+    "Amazon CloudFront",
+    "Elastic Load Balancing",
+    "Amazon EC2 Auto Scaling",
+    "AWS Lambda",
+    "Amazon ECS",
+    "Amazon EKS",
+    "Amazon S3",
+    "Amazon EFS",
+    "Amazon FSx",
+    "Amazon RDS",
+    "Amazon Aurora",
+    "Amazon DynamoDB",
+    "Amazon ElastiCache",
+    "Amazon SQS",
+    "Amazon SNS",
+    "Amazon EventBridge",
+    "AWS Step Functions",
+    "Amazon Kinesis",
+    "AWS KMS",
+    "AWS Backup",
+    "AWS Elastic Disaster Recovery",
+    "AWS Database Migration Service",
+    "AWS Application Migration Service",
+    "AWS DataSync",
+    "AWS Snow Family",
+    "Amazon CloudWatch",
+    "AWS Config",
+]
+
+GENERATION_PROMPT = """
+Create {count} original AWS Solutions Architect Professional (SAP-C02) practice
+scenario questions (NOT real exam questions) for the exam domain "{domain}",
+centred on {service}.
+
+Return ONLY a JSON array. Each item must have:
+- "question": the scenario and what is being asked (3-6 sentences),
+- "options": exactly 4 answer options as strings (no letter prefixes),
+- "answer": the letter of the best option ("A", "B", "C" or "D"),
+- "explanation": why the answer is best and why the others are weaker,
+- "services": list of the AWS services the scenario involves.
+""".strip()
+
+
+def _build_agent() -> Any:
+    # Imported lazily so `pack` works without the model dependencies installed
+    from strands import Agent
+    from strands.models import BedrockModel
+
+    model = BedrockModel(model_id=BEDROCK_MODEL_ID, temperature=0.8)
+    return Agent(model=model, callback_handler=None)
+
+
+def _result_text(result: Any) -> str:
+    if hasattr(result, "message") and isinstance(result.message, dict):
+        content = result.message.get("content", [])
+        if isinstance(content, list) and content:
+            first = content[0] or {}
+            text = first.get("text", "")
+            if text:
+                return text
+    return str(result)
+
+
+def _parse_questions(text: str, domain: str, service: str) -> List[Dict[str, Any]]:
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end <= start:
+        return []
+    try:
+        items = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return []
+
+    questions = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        options = item.get("options")
+        answer = str(item.get("answer", "")).strip().upper()[:1]
+        if not item.get("question") or not isinstance(options, list) or len(options) != 4:
+            continue
+        if answer not in ("A", "B", "C", "D"):
+            continue
+        # A bare string would otherwise be split into one-letter services
+        tags = item.get("services")
+        services = [str(s) for s in tags if s] if isinstance(tags, list) else []
+        if service not in services:
+            services.insert(0, service)
+        questions.append(
+            {
+                "domain": domain,
+                "services": services,
+                "question": str(item["question"]).strip(),
+                "options": [str(o).strip() for o in options],
+                "answer": answer,
+                "explanation": str(item.get("explanation", "")).strip(),
+            }
+        )
+    return questions
+
+
+def generate_pair(domain: str, service: str, count: int) -> List[Dict[str, Any]]:
+    """Ask the model for `count` scenarios for one (domain, service) pair."""
+    agent = _build_agent()
+    result = agent(GENERATION_PROMPT.format(count=count, domain=domain, service=service))
+    return _parse_questions(_result_text(result), domain, service)
+
+
+def _read_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    """Yield the records of `path`, skipping lines that do not decode."""
+    for number, line in enumerate(path.read_text(encoding="utf-8").splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            # e.g. the last line of a run that was killed mid-write
+            print(f"WARNING {path}:{number}: skipping line that is not valid JSON", file=sys.stderr)
+            continue
+        if isinstance(record, dict):
+            yield record
+
+
+def _done_pairs(path: Path) -> Set[Tuple[str, str]]:
+    done: Set[Tuple[str, str]] = set()
+    if path.exists():
+        for record in _read_jsonl(path):
+            if "domain" in record and "pair_service" in record:
+                done.add((record["domain"], record["pair_service"]))
+    return done
+
+
+def generate(out: Path, per_pair: int, workers: int) -> None:
+    done = _done_pairs(out)
+    pairs = [(d, s) for d in DOMAINS for s in SERVICES if (d, s) not in done]
+    print(f"Generating {len(pairs)} (domain, service) pairs, {len(done)} already done", file=sys.stderr)
+
+    write_lock = threading.Lock()
+    with out.open("a", encoding="utf-8") as f, ThreadPoolExecutor(max_workers=workers) as pool:
+        if f.tell() and not out.read_bytes().endswith(b"\n"):
+            f.write("\n")  # keep new records off a truncated last line
+        futures = {pool.submit(generate_pair, d, s, per_pair): (d, s) for d, s in pairs}
+        for future in as_completed(futures):
+            domain, service = futures[future]
+            try:
+                questions = future.result()
+            except Exception as e:
+                print(f"FAILED {domain} / {service}: {e}", file=sys.stderr)
+                continue
+            with write_lock:
+                for question in questions:
+                    question["pair_service"] = service
+                    f.write(json.dumps(question, ensure_ascii=False) + "\n")
+                f.flush()
+            print(f"{domain} / {service}: {len(questions)} questions", file=sys.stderr)
+
+
+def _fingerprint(question: Dict[str, Any]) -> str:
+    normalized = re.sub(r"[^a-z0-9]+", " ", question["question"].lower()).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def pack(sources: List[Path], out: Path) -> None:
+    seen: Set[str] = set()
+    questions: List[Dict[str, Any]] = []
+    for source in sources:
+        for question in _read_jsonl(source):
+            question.pop("pair_service", None)
+            fingerprint = _fingerprint(question)
+            if fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+            questions.append(question)
+
+    count = write_bank(str(out), questions)
+    print(f"Wrote {count} questions to {out}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    here = Path(__file__).parent
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="generate scenarios into a JSONL file")
+    gen.add_argument("--out", type=Path, default=here / "scenarios.jsonl")
+    gen.add_argument("--per-pair", type=int, default=5)
+    gen.add_argument("--workers", type=int, default=4)
+
+    pk = sub.add_parser("pack", help="pack JSONL scenarios into a bank file")
+    pk.add_argument("sources", type=Path, nargs="+")
+    pk.add_argument("--out", type=Path, default=here / "question_bank.saqb")
+
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        generate(args.out, args.per_pair, args.workers)
+    else:
+        pack(args.sources, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""
+On-demand diagnostics for the SA Pro tutor runtimes.
+
+When a deployed container gets slow or grows in memory, this module lets you
+look inside it without redeploying. It is driven through the normal
+invocation payload (AgentCore Runtime only exposes /invocations and /ping):
+
+    agentcore invoke '{"diagnostics": {"token": "<DIAGNOSTICS_TOKEN>", "action": "profile", "requests": 20}}'
+
+Supported actions:
+
+- "status":  show what is currently enabled, plus registered component stats
+             (e.g. Gateway call batching histograms).
+- "profile": arm a low-overhead sampling profiler for the next N requests
+             (payload field "requests", default 10).
+- "stacks":  return the sampled stacks in collapsed format, one
+             "frame;frame;frame count" line per stack, ready for
+             flamegraph.pl / speedscope. Pass "reset": true to clear them.
+- "memory":  start tracemalloc (if needed) and return the top allocators
+             (payload field "top", default 20) plus, per session, the size
+             of the conversation of its last request. Pass "stop": true to
+             stop tracemalloc and session tracking.
+
+Diagnostics are disabled unless DIAGNOSTICS_TOKEN is set in the runtime
+environment, and every diagnostics request must carry that token.
+"""
+
+import functools
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+DIAGNOSTICS_TOKEN = os.getenv("DIAGNOSTICS_TOKEN", "")
+
+SAMPLE_INTERVAL_SECONDS = 0.005  # 200 Hz while a profiled request is running
+MAX_PROFILED_REQUESTS = 1000
+MAX_DISTINCT_STACKS = 20000      # bound memory if stacks are very diverse
+MAX_STACK_DEPTH = 128
+MAX_TRACKED_SESSIONS = 256
+TRACEMALLOC_FRAMES = 5
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler that runs only while armed requests are in flight.
+
+    A daemon thread wakes every SAMPLE_INTERVAL_SECONDS, reads the current
+    frame of every other thread via sys._current_frames() and counts the
+    collapsed stacks. All threads are sampled because Strands runs the agent
+    loop and sync tools on its own executor threads, not the request thread;
+    stacks of concurrent unprofiled requests are included too. Threads parked
+    waiting for work (see _IDLE_LEAVES) are skipped. Nothing runs when no
+    request is armed.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_SECONDS) -> None:
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._active: Dict[int, int] = {}  # thread ident -> nesting depth
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._dropped = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def arm(self, requests: int) -> int:
+        """Profile the next `requests` invocations; returns the armed count."""
+        requests = max(0, min(int(requests), MAX_PROFILED_REQUESTS))
+        with self._lock:
+            self._remaining = requests
+        return requests
+
+    def begin_request(self) -> bool:
+        """Mark the calling thread as profiled if any requests are armed."""
+        # Fast path: no lock when profiling is off.
+        if not self._remaining:
+            return False
+        ident = threading.get_ident()
+        with self._lock:
+            if self._remaining <= 0:
+                return False
+            self._remaining -= 1
+            self._active[ident] = self._active.get(ident, 0) + 1
+            # A sampler told to stop may still be alive; it exits on its own
+            # flag, so start a new one with a fresh flag instead of reusing it
+            if self._thread is None or self._stop.is_set() or not self._thread.is_alive():
+                self._stop = threading.Event()
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._stop,), name="sa-pro-sampler", daemon=True
+                )
+                self._thread.start()
+        return True
+
+    def end_request(self) -> None:
+        ident = threading.get_ident()
+        with self._lock:
+            depth = self._active.get(ident, 0) - 1
+            if depth > 0:
+                self._active[ident] = depth
+            else:
+                self._active.pop(ident, None)
+            if not self._active and self._remaining <= 0:
+                self._stop.set()
+
+    def collapsed(self, reset: bool = False) -> str:
+        """Return sampled stacks in Brendan Gregg's collapsed format."""
+        with self._lock:
+            lines = [f"{stack} {count}" for stack, count in self._stacks.most_common()]
+            if reset:
+                self._stacks.clear()
+                self._samples = 0
+                self._dropped = 0
+        return "\n".join(lines)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "armedRequests": self._remaining,
+                "activeRequests": len(self._active),
+                "samples": self._samples,
+                "distinctStacks": len(self._stacks),
+                "droppedSamples": self._dropped,
+                "intervalMs": self.interval * 1000,
+            }
+
+    def _run(self, stop: threading.Event) -> None:
+        me = threading.get_ident()
+        while not stop.wait(self.interval):
+            if not self._active:
+                continue
+            collected = [
+                _collapse(frame)
+                for ident, frame in sys._current_frames().items()
+                if ident != me and not _is_idle(frame)
+            ]
+            with self._lock:
+                for stack in collected:
+                    self._samples += 1
+                    if stack in self._stacks or len(self._stacks) < MAX_DISTINCT_STACKS:
+                        self._stacks[stack] += 1
+                    else:
+                        self._dropped += 1
+
+
+# Leaf frames of threads parked waiting for work: executor workers, the Gateway
+# batcher, OpenTelemetry exporters (all in Condition.wait) and the asyncio loop
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("thread.py", "_worker"),
+    ("selectors.py", "select"),
+}
+
+
+def _is_idle(frame: Any) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES
+
+
+def _collapse(frame: Any) -> str:
+    parts: List[str] = []
+    while frame is not None and len(parts) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    parts.reverse()
+    # ';' separates frames and ' ' separates the count in collapsed format
+    return ";".join(p.replace(";", ":").replace(" ", "_") for p in parts)
+
+
+profiler = SamplingProfiler()
+
+# Extra component stats shown by the "status" action, e.g. Gateway batching
+_stats_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register_stats(name: str, provider: Callable[[], Dict[str, Any]]) -> None:
+    """Include `provider()` under `name` in the diagnostics status output."""
+    _stats_providers[name] = provider
+
+
+_sessions_lock = threading.Lock()
+_session_memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_track_sessions = False
+
+
+def record_agent(context: Any, agent: Any) -> None:
+    """
+    Record the conversation size of `agent` as the session's last request.
+
+    The runtimes build a new Agent per request, so this is the footprint of
+    one request's conversation, not state retained across the session. Only
+    does work while memory diagnostics are enabled, so it is safe to call on
+    every request.
+    """
+    if not _track_sessions:
+        return
+    session_id = getattr(context, "session_id", None) or "anonymous"
+    messages = getattr(agent, "messages", None) or []
+    try:
+        approx_bytes = len(json.dumps(messages, default=str))
+    except (TypeError, ValueError):
+        approx_bytes = sys.getsizeof(messages)
+    with _sessions_lock:
+        _session_memory[session_id] = {
+            "messages": len(messages),
+            "approxBytes": approx_bytes,
+            "updatedAt": time.time(),
+        }
+        _session_memory.move_to_end(session_id)
+        while len(_session_memory) > MAX_TRACKED_SESSIONS:
+            _session_memory.popitem(last=False)
+
+
+def _memory_report(top: int, stop: bool) -> Dict[str, Any]:
+    global _track_sessions
+
+    if stop:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        with _sessions_lock:
+            _track_sessions = False
+            _session_memory.clear()
+        return {"tracing": False}
+
+    started = False
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        started = True
+    _track_sessions = True
+
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        )
+    )
+    current, peak = tracemalloc.get_traced_memory()
+    allocators = [
+        {
+            "location": str(stat.traceback[0]),
+            "sizeKiB": round(stat.size / 1024, 1),
+            "count": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[: max(1, top)]
+    ]
+    with _sessions_lock:
+        sessions = dict(_session_memory)
+
+    return {
+        "tracing": True,
+        # Allocations made before tracing started are invisible; re-run later.
+        "justStarted": started,
+        "tracedCurrentKiB": round(current / 1024, 1),
+        "tracedPeakKiB": round(peak / 1024, 1),
+        "topAllocators": allocators,
+        "lastRequestBySession": sessions,
+    }
+
+
+def _non_negative_int(value: Any) -> Optional[int]:
+    """Parse a payload count; None if it is not a non-negative integer."""
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return number if number >= 0 else None
+
+
+def handle(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one diagnostics action and return an entrypoint-style response."""
+    if not DIAGNOSTICS_TOKEN:
+        return {"result": "Diagnostics are disabled (DIAGNOSTICS_TOKEN is not set)."}
+    token = str(request.get("token", ""))
+    if not hmac.compare_digest(token.encode(), DIAGNOSTICS_TOKEN.encode()):
+        return {"result": "Diagnostics token is missing or invalid."}
+
+    action = request.get("action", "status")
+
+    if action == "profile":
+        requests = _non_negative_int(request.get("requests", 10))
+        if requests is None:
+            return {"result": "'requests' must be a non-negative integer."}
+        armed = profiler.arm(requests)
+        return {
+            "result": f"Sampling profiler armed for the next {armed} request(s).",
+            "diagnostics": profiler.status(),
+        }
+
+    if action == "stacks":
+        collapsed = profiler.collapsed(reset=bool(request.get("reset", False)))
+        return {"result": collapsed, "diagnostics": profiler.status()}
+
+    if action == "memory":
+        top = _non_negative_int(request.get("top", 20))
+        if top is None:
+            return {"result": "'top' must be a non-negative integer."}
+        report = _memory_report(
+            top=top,
+            stop=bool(request.get("stop", False)),
+        )
+        summary = (
+            f"Traced memory: {report['tracedCurrentKiB']} KiB "
+            f"(peak {report['tracedPeakKiB']} KiB)."
+            if report["tracing"]
+            else "tracemalloc stopped."
+        )
+        return {"result": summary, "diagnostics": report}
+
+    if action == "status":
+        return {
+            "result": "Diagnostics enabled.",
+            "diagnostics": {
+                "profiler": profiler.status(),
+                "tracemalloc": tracemalloc.is_tracing(),
+                "trackedSessions": len(_session_memory),
+                **{name: provider() for name, provider in _stats_providers.items()},
+            },
+        }
+
+    return {"result": f"Unknown diagnostics action: {action!r}."}
+
+
+def instrumented(handler: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+    """
+    Wrap an entrypoint so it answers diagnostics payloads and can be profiled.
+
+    Place it under @app.entrypoint:
+
+        @app.entrypoint
+        @diagnostics.instrumented
+        def invoke(payload, context=None): ...
+    """
+
+    @functools.wraps(handler)
+    def wrapper(payload: Dict[str, Any], context: Any = None) -> Dict[str, Any]:
+        request = payload.get("diagnostics") if isinstance(payload, dict) else None
+        if isinstance(request, dict):
+            return handle(request)
+
+        profiled = profiler.begin_request()
+        try:
+            return handler(payload, context)
+        finally:
+            if profiled:
+                profiler.end_request()
+
+    return wrapper
@@ -0,0 +1,195 @@
+"""
+Client-side micro-batching for AgentCore Gateway calls.
+
+Under concurrent load every request used to send its own small HTTP call to
+the same Gateway endpoint. MicroBatcher gathers calls that arrive within a
+short window (or until max_batch calls are waiting), hands them to a
+send_batch function as one list and routes each result back to its caller.
+
+Two histograms describe the latency/throughput trade-off:
+
+- <name>.batch_size: calls per flushed batch
+- <name>.added_wait: milliseconds each call waited before its batch was sent
+
+They are exported through OpenTelemetry when it is available (the container
+runs under `opentelemetry-instrument`) and are also kept in process so
+stats() can report them, e.g. via the diagnostics "status" action.
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from opentelemetry import metrics  # provided by aws-opentelemetry-distro
+except ImportError:  # local runs without the distro installed
+    metrics = None
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+ADDED_WAIT_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100)
+MAX_IN_FLIGHT_BATCHES = 4
+
+_meter = metrics.get_meter(__name__) if metrics is not None else None
+
+
+class Histogram:
+    """Fixed-bucket histogram mirrored to an OpenTelemetry histogram if possible."""
+
+    def __init__(self, name: str, bounds: Sequence[float], unit: str, description: str) -> None:
+        self.name = name
+        self.bounds = tuple(bounds)
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._otel = (
+            _meter.create_histogram(name, unit=unit, description=description)
+            if _meter is not None
+            else None
+        )
+
+    def record(self, value: float) -> None:
+        bucket = next((i for i, bound in enumerate(self.bounds) if value <= bound), len(self.bounds))
+        with self._lock:
+            self._counts[bucket] += 1
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+        if self._otel is not None:
+            self._otel.record(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            labels = [f"<={bound:g}" for bound in self.bounds] + ["+Inf"]
+            return {
+                "count": self._count,
+                "mean": round(self._sum / self._count, 3) if self._count else 0.0,
+                "max": round(self._max, 3),
+                "buckets": dict(zip(labels, self._counts)),
+            }
+
+
+class MicroBatcher:
+    """
+    Collect items from many threads and send them in batches.
+
+    send_batch receives a list of items and must return one result per item,
+    in the same order. A result that is an exception instance is raised for
+    that caller only; if send_batch itself raises, every caller in that batch
+    gets the error. A window of 0 (or max_batch of 1) disables batching: each
+    call is sent straight from the caller's thread.
+
+    Callers wait at most `timeout` seconds (None: no limit) for their batch,
+    so it should cover the window plus the slowest send_batch call.
+    """
+
+    def __init__(
+        self,
+        send_batch: Callable[[List[Any]], List[Any]],
+        window_ms: float,
+        max_batch: int,
+        name: str,
+        timeout: Optional[float] = None,
+    ) -> None:
+        self._send_batch = send_batch
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.name = name
+        self.timeout = timeout
+        self.batch_size = Histogram(
+            f"{name}.batch_size", BATCH_SIZE_BUCKETS, "{call}", "Calls per flushed batch"
+        )
+        self.added_wait = Histogram(
+            f"{name}.added_wait", ADDED_WAIT_BUCKETS_MS, "ms", "Time a call waited before its batch was sent"
+        )
+        self._cond = threading.Condition()
+        self._pending: List[Tuple[Any, Future, float]] = []
+        self._worker: Optional[threading.Thread] = None
+        self._senders: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_batch > 1
+
+    def disable(self) -> None:
+        """Send every later call on its own (e.g. the endpoint rejects batches)."""
+        with self._cond:
+            self.window = 0.0
+            self._cond.notify()
+
+    def submit(self, item: Any) -> Any:
+        """Queue `item`, block until its batch is sent and return its result."""
+        if not self.enabled:
+            self.batch_size.record(1)
+            self.added_wait.record(0.0)
+            result = self._send_batch([item])[0]
+            if isinstance(result, BaseException):
+                raise result
+            return result
+
+        future: Future = Future()
+        with self._cond:
+            self._pending.append((item, future, time.monotonic()))
+            if self._worker is None or not self._worker.is_alive():
+                if self._senders is None:
+                    self._senders = ThreadPoolExecutor(
+                        max_workers=MAX_IN_FLIGHT_BATCHES, thread_name_prefix=f"{self.name}-send"
+                    )
+                self._worker = threading.Thread(target=self._run, name=f"{self.name}-batcher", daemon=True)
+                self._worker.start()
+            self._cond.notify()
+        return future.result(timeout=self.timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "windowMs": self.window * 1000,
+            "maxBatch": self.max_batch,
+            "batchSize": self.batch_size.snapshot(),
+            "addedWaitMs": self.added_wait.snapshot(),
+        }
+
+    def _run(self) -> None:
+        while True:
+            batch: List[Tuple[Any, Future, float]] = []
+            try:
+                with self._cond:
+                    while not self._pending:
+                        self._cond.wait()
+                    while len(self._pending) < self.max_batch:
+                        # The window starts when the oldest call arrived
+                        remaining = self._pending[0][2] + self.window - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    batch = self._pending[: self.max_batch]
+                    del self._pending[: self.max_batch]
+
+                self._senders.submit(self._dispatch, batch)
+            except Exception as e:
+                # e.g. the sender pool was shut down; fail the batch rather
+                # than leave its callers waiting for a send that never happens
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _dispatch(self, batch: List[Tuple[Any, Future, float]]) -> None:
+        # Measured here, not at flush, so time queued behind in-flight batches counts
+        started = time.monotonic()
+        self.batch_size.record(len(batch))
+        for _, _, enqueued in batch:
+            self.added_wait.record((started - enqueued) * 1000)
+        try:
+            results = self._send_batch([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name}: got {len(results)} results for {len(batch)} calls")
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,428 @@
+"""
+Local retrieval index over AWS reference notes (Phase 3 knowledge base).
+
+A folder of architecture notes (.md / .txt) is split into chunks and indexed
+on disk (see build_knowledge_base.py). At request time the runtimes score the
+prompt against every chunk, take the top-k and put only those snippets in
+front of the question, so grounding stays cheap.
+
+Scoring is BM25 over sparse term vectors: lower-cased words with stopwords
+removed, plus adjacent-word bigrams, each hashed to a 32-bit term id. No
+network call is needed for indexing or queries, so latency stays predictable.
+Query scores are normalised by the score of an average-length chunk that
+contains every query term once, so MIN_SCORE is roughly "fraction of the
+query's IDF weight that matched".
+
+Index directory layout (all little-endian):
+
+    manifest.json    : commit point; names the current generation and lists
+                       indexed files, their SHA-1 and chunk rows
+    gen-NNNNNN/      : one complete, immutable generation of the index
+        chunks.txt   : UTF-8 chunk texts, back to back
+        offsets.u64  : (count + 1) byte offsets into chunks.txt
+        sources.i32  : source file id per chunk
+        doc_len.f32  : number of terms per chunk
+        fwd_ptr.u64, fwd_terms.u32, fwd_tf.f32 : per-chunk term vectors
+        inv_terms.u32, inv_ptr.u64, inv_rows.u32, inv_tf.f32 : postings by term
+
+Re-indexing only tokenises new or changed files; chunks of unchanged files
+are copied from the previous generation. The new generation is written to
+its own directory and becomes visible only when manifest.json is replaced,
+so a crash at any point leaves the previous index intact.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import shutil
+import threading
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_BASE_DIR = os.getenv(
+    "KNOWLEDGE_BASE_DIR", str(Path(__file__).parent / "knowledge_base")
+)
+
+CHUNK_CHARS = 800
+NOTE_SUFFIXES = {".md", ".txt"}
+
+TOP_K = 4
+# Normalised BM25 score below this is treated as noise. Measured on ten short
+# AWS topic notes: the right note scored 0.17-0.74 for ten related questions,
+# ten off-topic questions scored at most 0.08, and notes sharing only a generic
+# word such as "Region" scored 0.04-0.22.
+MIN_SCORE = 0.15
+MAX_CONTEXT_CHARS = 3000   # cap on snippet text added to a prompt
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+INDEX_VERSION = 2
+_MANIFEST = "manifest.json"
+
+_STOPWORDS = set(
+    """
+    a about above after again all also am an and any are as at be because been
+    before being below between both but by can could did do does doing down
+    during each few for from further had has have having he her here hers how
+    i if in into is it its itself just me more most my no nor not now of off
+    on once only or other our out over own same she should so some such than
+    that the their them then there these they this those through to too under
+    until up very was we were what when where which while who whom why will
+    with would you your aws amazon use using used
+    """.split()
+)
+
+
+def _words(text: str) -> List[str]:
+    words = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in _STOPWORDS:
+            continue
+        # Cheap plural folding: "regions" -> "region", but keep "access", "ssis"
+        if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def term_frequencies(text: str) -> Counter:
+    """Return {term id: count} for the words and bigrams of `text`."""
+    words = _words(text)
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return Counter(zlib.crc32(feature.encode("utf-8")) for feature in features)
+
+
+def chunk_text(text: str, max_chars: int = CHUNK_CHARS) -> List[str]:
+    """Pack paragraphs into chunks of at most `max_chars` characters."""
+    chunks: List[str] = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(". ", 0, max_chars)
+            cut = cut + 1 if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:cut].strip())
+            paragraph = paragraph[cut:].strip()
+        if current and len(current) + len(paragraph) + 1 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current} {paragraph}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _load_manifest(kb_dir: Path) -> Optional[Dict[str, Any]]:
+    path = kb_dir / _MANIFEST
+    if not path.exists():
+        return None
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    if manifest.get("version") != INDEX_VERSION:
+        raise ValueError(f"{path} is not a version {INDEX_VERSION} knowledge base; re-run with --rebuild")
+    return manifest
+
+
+def _open_array(path: Path, dtype: str) -> np.ndarray:
+    # np.memmap cannot map empty files
+    if path.stat().st_size == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+class _Generation:
+    """Memory-mapped arrays of one index generation."""
+
+    def __init__(self, gen_dir: Path) -> None:
+        self.dir = gen_dir
+        self.offsets = _open_array(gen_dir / "offsets.u64", "<u8")
+        self.sources = _open_array(gen_dir / "sources.i32", "<i4")
+        self.doc_len = _open_array(gen_dir / "doc_len.f32", "<f4")
+        self.fwd_ptr = _open_array(gen_dir / "fwd_ptr.u64", "<u8")
+        self.fwd_terms = _open_array(gen_dir / "fwd_terms.u32", "<u4")
+        self.fwd_tf = _open_array(gen_dir / "fwd_tf.f32", "<f4")
+        self.inv_terms = _open_array(gen_dir / "inv_terms.u32", "<u4")
+        self.inv_ptr = _open_array(gen_dir / "inv_ptr.u64", "<u8")
+        self.inv_rows = _open_array(gen_dir / "inv_rows.u32", "<u4")
+        self.inv_tf = _open_array(gen_dir / "inv_tf.f32", "<f4")
+        text_path = gen_dir / "chunks.txt"
+        self.text: Any = b""
+        if text_path.stat().st_size:
+            with open(text_path, "rb") as f:
+                self.text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def chunk(self, row: int) -> str:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return self.text[start:end].decode("utf-8")
+
+
+class KnowledgeBase:
+    """Read-only view over the current index generation."""
+
+    def __init__(self, kb_dir: str) -> None:
+        directory = Path(kb_dir)
+        manifest = _load_manifest(directory)
+        if manifest is None:
+            raise FileNotFoundError(f"no {_MANIFEST} in {directory}")
+        self.count: int = manifest["count"]
+        self.avg_len: float = manifest["avg_len"] or 1.0
+        self.sources: List[str] = manifest["sources"]
+        self._gen = _Generation(directory / manifest["generation"])
+
+    def __len__(self) -> int:
+        return self.count
+
+    def search(self, query: str, k: int = TOP_K) -> List[Tuple[float, str, str]]:
+        """Return up to `k` (normalised score, source file, chunk text), best first."""
+        gen = self._gen
+        tf = term_frequencies(query)
+        # No terms at all, e.g. every note is stopwords only
+        if not self.count or not tf or len(gen.inv_terms) == 0:
+            return []
+
+        qterms = np.fromiter(tf.keys(), dtype=np.uint32, count=len(tf))
+        qweights = np.fromiter(tf.values(), dtype=np.float32, count=len(tf))
+        pos = np.searchsorted(gen.inv_terms, qterms)
+        pos = np.minimum(pos, len(gen.inv_terms) - 1)
+        found = gen.inv_terms[pos] == qterms
+        starts = gen.inv_ptr[pos].astype(np.int64)
+        ends = gen.inv_ptr[pos + 1].astype(np.int64)
+        df = np.where(found, ends - starts, 0)
+        idf = np.log1p((self.count - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        # Reference score: an average-length chunk containing every query term once
+        ref_score = float((qweights * idf).sum())
+        scores = np.zeros(self.count, dtype=np.float32)
+        for i in np.flatnonzero(found):
+            rows = gen.inv_rows[starts[i]:ends[i]]
+            tfs = gen.inv_tf[starts[i]:ends[i]]
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * gen.doc_len[rows] / self.avg_len)
+            scores[rows] += qweights[i] * idf[i] * tfs * (BM25_K1 + 1) / (tfs + norm)
+        if ref_score <= 0:
+            return []
+
+        k = min(k, self.count)
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [
+            (float(scores[row]) / ref_score, self.sources[gen.sources[row]], gen.chunk(int(row)))
+            for row in top
+            if scores[row] > 0
+        ]
+
+
+def _write_generation(
+    gen_dir: Path,
+    texts: List[bytes],
+    sources: np.ndarray,
+    fwd_counts: np.ndarray,
+    fwd_terms: np.ndarray,
+    fwd_tf: np.ndarray,
+) -> None:
+    """Write a complete generation; `fwd_counts` is the number of terms per chunk."""
+    count = len(texts)
+    offsets = np.zeros(count + 1, dtype="<u8")
+    offsets[1:] = np.cumsum([len(t) for t in texts])
+    fwd_ptr = np.zeros(count + 1, dtype="<u8")
+    fwd_ptr[1:] = np.cumsum(fwd_counts)
+    rows = np.repeat(np.arange(count, dtype="<u4"), fwd_counts)
+    doc_len = np.bincount(rows, weights=fwd_tf, minlength=count).astype("<f4")
+
+    order = np.argsort(fwd_terms, kind="stable")
+    inv_terms, inv_counts = np.unique(fwd_terms[order], return_counts=True)
+    inv_ptr = np.zeros(len(inv_terms) + 1, dtype="<u8")
+    inv_ptr[1:] = np.cumsum(inv_counts)
+
+    gen_dir.mkdir(parents=True)
+    arrays = {
+        "offsets.u64": offsets,
+        "sources.i32": sources.astype("<i4"),
+        "doc_len.f32": doc_len,
+        "fwd_ptr.u64": fwd_ptr,
+        "fwd_terms.u32": fwd_terms.astype("<u4"),
+        "fwd_tf.f32": fwd_tf.astype("<f4"),
+        "inv_terms.u32": inv_terms.astype("<u4"),
+        "inv_ptr.u64": inv_ptr,
+        "inv_rows.u32": rows[order],
+        "inv_tf.f32": fwd_tf[order].astype("<f4"),
+    }
+    for name, array in arrays.items():
+        array.tofile(gen_dir / name)
+    (gen_dir / "chunks.txt").write_bytes(b"".join(texts))
+
+
+def _next_free(directory: Path) -> int:
+    """Generation number above any existing (or half-written) generation directory."""
+    numbers = [
+        int(m.group(1)) for p in directory.glob("gen-*") if (m := re.match(r"gen-(\d+)", p.name))
+    ]
+    return max(numbers, default=-1) + 1
+
+
+def index_folder(notes_dir: str, kb_dir: str, rebuild: bool = False) -> Dict[str, int]:
+    """
+    Incrementally index every note under `notes_dir` into `kb_dir`.
+
+    Unchanged files (same SHA-1) are copied from the current generation;
+    new and changed files are re-chunked and tokenised; removed files are
+    dropped. Returns counters.
+    """
+    notes_root = Path(notes_dir)
+    directory = Path(kb_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    manifest = None if rebuild else _load_manifest(directory)
+    old_files: Dict[str, Dict[str, Any]] = manifest["files"] if manifest else {}
+    old = _Generation(directory / manifest["generation"]) if manifest else None
+    generation = _next_free(directory)
+
+    stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "chunks": 0}
+    files: Dict[str, Dict[str, Any]] = {}
+    sources: List[str] = []
+    texts: List[bytes] = []
+    row_sources: List[int] = []
+    counts: List[np.ndarray] = []
+    terms: List[np.ndarray] = []
+    tfs: List[np.ndarray] = []
+
+    for path in sorted(p for p in notes_root.rglob("*") if p.suffix.lower() in NOTE_SUFFIXES):
+        rel = path.relative_to(notes_root).as_posix()
+        raw = path.read_bytes()
+        digest = hashlib.sha1(raw).hexdigest()
+        source_id = len(sources)
+        sources.append(rel)
+        first_row = len(texts)
+        info = old_files.get(rel)
+
+        if old is not None and info and info["sha1"] == digest:
+            start, end = info["rows"]
+            texts.extend(old.text[old.offsets[r]:old.offsets[r + 1]] for r in range(start, end))
+            fwd_start, fwd_end = int(old.fwd_ptr[start]), int(old.fwd_ptr[end])
+            counts.append(np.diff(old.fwd_ptr[start:end + 1].astype(np.int64)))
+            terms.append(np.asarray(old.fwd_terms[fwd_start:fwd_end]))
+            tfs.append(np.asarray(old.fwd_tf[fwd_start:fwd_end]))
+            stats["unchanged"] += 1
+        else:
+            chunks = chunk_text(raw.decode("utf-8", errors="replace"))
+            for chunk in chunks:
+                tf = term_frequencies(chunk)
+                texts.append(chunk.encode("utf-8"))
+                counts.append(np.array([len(tf)], dtype=np.int64))
+                terms.append(np.fromiter(tf.keys(), dtype=np.uint32, count=len(tf)))
+                tfs.append(np.fromiter(tf.values(), dtype=np.float32, count=len(tf)))
+            stats["updated" if info else "added"] += 1
+            stats["chunks"] += len(chunks)
+
+        row_sources.extend([source_id] * (len(texts) - first_row))
+        files[rel] = {"sha1": digest, "rows": [first_row, len(texts)]}
+
+    stats["removed"] = len(set(old_files) - set(files))
+
+    def _cat(parts: List[np.ndarray], dtype: Any) -> np.ndarray:
+        return np.concatenate(parts).astype(dtype) if parts else np.empty(0, dtype=dtype)
+
+    fwd_counts = _cat(counts, np.int64)
+    fwd_tf = _cat(tfs, np.float32)
+    gen_name = f"gen-{generation:06d}"
+    tmp_dir = directory / f"{gen_name}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    _write_generation(
+        tmp_dir,
+        texts,
+        np.asarray(row_sources, dtype=np.int32),
+        fwd_counts,
+        _cat(terms, np.uint32),
+        fwd_tf,
+    )
+    shutil.rmtree(directory / gen_name, ignore_errors=True)
+    os.replace(tmp_dir, directory / gen_name)
+
+    new_manifest = {
+        "version": INDEX_VERSION,
+        "generation": gen_name,
+        "count": len(texts),
+        "avg_len": float(fwd_tf.sum() / len(texts)) if texts else 0.0,
+        "sources": sources,
+        "files": files,
+    }
+    # The manifest switch is the only commit point; older generations are
+    # garbage afterwards (running readers keep their mmaps until restart)
+    tmp_manifest = directory / f"{_MANIFEST}.tmp"
+    tmp_manifest.write_text(json.dumps(new_manifest), encoding="utf-8")
+    os.replace(tmp_manifest, directory / _MANIFEST)
+
+    for stale in directory.glob("gen-*"):
+        if stale.name != gen_name:
+            shutil.rmtree(stale, ignore_errors=True)
+    return stats
+
+
+_kb: Optional[KnowledgeBase] = None
+_kb_loaded = False
+_kb_lock = threading.Lock()
+
+
+def get_knowledge_base() -> Optional[KnowledgeBase]:
+    """Open the index on first use; None if no usable index is deployed."""
+    global _kb, _kb_loaded
+    if not _kb_loaded:
+        with _kb_lock:
+            if not _kb_loaded:
+                if (Path(KNOWLEDGE_BASE_DIR) / _MANIFEST).exists():
+                    try:
+                        _kb = KnowledgeBase(KNOWLEDGE_BASE_DIR)
+                    except (OSError, ValueError, KeyError):
+                        # A bad index must not break requests; prompts go out unchanged
+                        logger.exception("Could not open knowledge base %s", KNOWLEDGE_BASE_DIR)
+                _kb_loaded = True
+    return _kb
+
+
+def augment_prompt(prompt: str) -> str:
+    """
+    Prefix `prompt` with the most relevant reference-note snippets.
+
+    Returns the prompt unchanged when no index is deployed, retrieval fails
+    or nothing in the index is similar enough to help.
+    """
+    kb = get_knowledge_base()
+    if kb is None:
+        return prompt
+
+    try:
+        hits = kb.search(prompt)
+    except Exception:
+        # Retrieval is an optional extra; answer without it rather than fail
+        logger.exception("Knowledge base search failed")
+        return prompt
+
+    snippets: List[str] = []
+    budget = MAX_CONTEXT_CHARS
+    for score, source, text in hits:
+        if score < MIN_SCORE or budget <= 0:
+            break
+        text = text[:budget]
+        budget -= len(text)
+        snippets.append(f"[{len(snippets) + 1}] ({source}) {text}")
+
+    if not snippets:
+        return prompt
+    return (
+        "Reference notes (use them where relevant, ignore them otherwise):\n"
+        + "\n".join(snippets)
+        + f"\n\nQuestion:\n{prompt}"
+    )
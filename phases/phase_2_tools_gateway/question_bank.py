@@ -0,0 +1,294 @@
+"""
+Precomputed SA Pro practice-scenario bank.
+
+Generating a practice scenario with the model takes several seconds. This
+module serves "give me a question on X" requests from a bank that was
+generated offline (see build_question_bank.py) instead. Only the scenario
+and options are sent; a follow-up such as "show the answer" is answered from
+the bank with the answer and explanation of the session's last question.
+
+Bank file layout (little-endian), opened with mmap so only the questions
+actually served are paged in:
+
+    header   : magic "SAQB", version (u16), reserved (u16),
+               question count (u32), index length in bytes (u64)
+    index    : UTF-8 JSON {"terms": {term: [question ids]}}
+    offsets  : (count + 1) x u64 offsets into the records blob
+    records  : one compact UTF-8 JSON object per question
+
+Each record has: id, domain, services, question, options, answer, explanation.
+"""
+
+import json
+import logging
+import mmap
+import os
+import random
+import re
+import struct
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+QUESTION_BANK_PATH = os.getenv(
+    "QUESTION_BANK_PATH", str(Path(__file__).parent / "question_bank.saqb")
+)
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SAQB"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHIQ")
+_OFFSET = struct.Struct("<Q")
+
+MAX_TRACKED_SESSIONS = 1024
+_RANDOM_PICK_ATTEMPTS = 8
+
+# Words that carry no topic meaning in tags or requests
+_STOPWORDS = {"a", "an", "and", "the", "of", "on", "for", "to", "with", "in", "aws", "amazon"}
+
+_REQUEST_PATTERN = re.compile(
+    r"^\s*(?:please\s+)?(?:can\s+you\s+)?(?:give|ask|send|show)\s+me\s+"
+    r"(?:a|an|one|another|some)?\s*(?:new\s+)?(?:sa\s*pro\s+)?(?:practice\s+)?"
+    r"(?:scenario\s+)?(?:question|scenario|quiz)"
+    r"(?:\s+(?:on|about|for|covering|around)\s+(?P<topic>.+?))?"
+    r"\s*(?:,?\s*please)?[.?!]*\s*$",
+    re.IGNORECASE,
+)
+
+_ANSWER_PATTERN = re.compile(
+    r"^\s*(?:please\s+)?(?:can\s+you\s+)?(?:(?:show|give|tell|reveal)\s+(?:me\s+)?"
+    r"|what\s*'?s\s+|what\s+is\s+)?(?:the\s+)?(?:correct\s+)?answer"
+    r"(?:\s+and\s+(?:the\s+)?explanation)?\s*(?:,?\s*please)?[.?!]*\s*$",
+    re.IGNORECASE,
+)
+
+
+def _tokens(text: str) -> List[str]:
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in _STOPWORDS]
+
+
+def index_terms(domain: str, services: Iterable[str]) -> Set[str]:
+    """
+    Return the index terms for a question's domain and service tags.
+
+    Services are indexed by full name and by each word ("direct connect",
+    "direct", "connect"). Domains are indexed by full name only: their words
+    ("design", "new", "solutions") would otherwise match almost any topic.
+    """
+    terms: Set[str] = set()
+    domain_tokens = _tokens(domain)
+    if domain_tokens:
+        terms.add(" ".join(domain_tokens))
+    for service in services:
+        tokens = _tokens(service)
+        if tokens:
+            terms.add(" ".join(tokens))
+            terms.update(tokens)
+    return terms
+
+
+def match_request(prompt: str) -> Optional[str]:
+    """
+    Return the requested topic if `prompt` asks for a practice question.
+
+    Returns "" when a question is requested without a topic and None when the
+    prompt is not a question request at all.
+    """
+    match = _REQUEST_PATTERN.match(prompt)
+    if not match:
+        return None
+    return (match.group("topic") or "").strip()
+
+
+def is_answer_request(prompt: str) -> bool:
+    """Return True if `prompt` asks for the answer to the last question."""
+    return _ANSWER_PATTERN.match(prompt) is not None
+
+
+def write_bank(path: str, questions: List[Dict[str, Any]]) -> int:
+    """
+    Write `questions` to a bank file at `path` and return the count written.
+
+    Question ids are reassigned to their position in the file.
+    """
+    terms: Dict[str, List[int]] = {}
+    blobs: List[bytes] = []
+    for qid, question in enumerate(questions):
+        record = dict(question, id=qid)
+        blobs.append(json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+        for term in index_terms(record.get("domain", ""), record.get("services", [])):
+            terms.setdefault(term, []).append(qid)
+
+    index = json.dumps({"terms": terms}, separators=(",", ":")).encode("utf-8")
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, len(blobs), len(index)))
+        f.write(index)
+        offset = 0
+        for blob in blobs:
+            f.write(_OFFSET.pack(offset))
+            offset += len(blob)
+        f.write(_OFFSET.pack(offset))
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return len(blobs)
+
+
+class QuestionBank:
+    """Read-only, memory-mapped view over a bank file."""
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, count, index_len = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} question bank")
+
+        index_start = _HEADER.size
+        self._offsets_start = index_start + index_len
+        self._records_start = self._offsets_start + (count + 1) * _OFFSET.size
+        self.count = count
+        self.terms: Dict[str, List[int]] = json.loads(
+            self._mm[index_start:self._offsets_start].decode("utf-8")
+        )["terms"]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def get(self, qid: int) -> Dict[str, Any]:
+        pos = self._offsets_start + qid * _OFFSET.size
+        start = _OFFSET.unpack_from(self._mm, pos)[0]
+        end = _OFFSET.unpack_from(self._mm, pos + _OFFSET.size)[0]
+        return json.loads(self._mm[self._records_start + start:self._records_start + end])
+
+    def lookup(self, topic: str) -> Optional[Sequence[int]]:
+        """
+        Return question ids for `topic`, or None if the bank does not cover it.
+
+        An exact tag match wins ("direct connect"); otherwise every word of the
+        topic must match ("s3 replication" -> questions tagged with both).
+        An empty topic matches the whole bank.
+        """
+        tokens = _tokens(topic)
+        if not tokens:
+            return None if topic.strip() else range(self.count)
+
+        exact = self.terms.get(" ".join(tokens))
+        if exact:
+            return exact
+
+        postings = [self.terms.get(token) for token in tokens]
+        if not all(postings):
+            return None
+        postings.sort(key=len)
+        ids = set(postings[0]).intersection(*postings[1:])
+        return sorted(ids) or None
+
+
+def format_question(record: Dict[str, Any]) -> str:
+    """Render a bank record's scenario and options, without the answer."""
+    letters = "ABCDEFGH"
+    lines = [
+        f"Practice scenario ({record.get('domain', 'SA Pro')}; "
+        f"services: {', '.join(record.get('services', [])) or 'various'})",
+        "",
+        record.get("question", ""),
+        "",
+    ]
+    lines.extend(f"{letters[i]}. {option}" for i, option in enumerate(record.get("options", [])))
+    lines.extend(["", 'Reply with your choice, or ask me to "show the answer".'])
+    return "\n".join(lines)
+
+
+def format_answer(record: Dict[str, Any]) -> str:
+    """Render a bank record's answer and explanation."""
+    return f"Answer: {record.get('answer', '')}\n\n{record.get('explanation', '')}".strip()
+
+
+_bank: Optional[QuestionBank] = None
+_bank_loaded = False
+_bank_lock = threading.Lock()
+
+_served_lock = threading.Lock()
+_served: "OrderedDict[str, Set[int]]" = OrderedDict()
+_last_served: Dict[str, int] = {}  # session id -> qid whose answer is pending
+
+
+def get_bank() -> Optional[QuestionBank]:
+    """Open the bank on first use; None if no usable bank file is deployed."""
+    global _bank, _bank_loaded
+    if not _bank_loaded:
+        with _bank_lock:
+            if not _bank_loaded:
+                if os.path.exists(QUESTION_BANK_PATH):
+                    try:
+                        _bank = QuestionBank(QUESTION_BANK_PATH)
+                    except (OSError, ValueError, KeyError, struct.error):
+                        # A bad bank must not break requests; they go to the model
+                        logger.exception("Could not open question bank %s", QUESTION_BANK_PATH)
+                _bank_loaded = True
+    return _bank
+
+
+def _pick_unserved(ids: Sequence[int], served: Set[int]) -> Optional[int]:
+    # Random probes are enough until the session has seen most of the topic
+    for _ in range(_RANDOM_PICK_ATTEMPTS):
+        qid = ids[random.randrange(len(ids))]
+        if qid not in served:
+            return qid
+    start = random.randrange(len(ids))
+    for i in range(len(ids)):
+        qid = ids[(start + i) % len(ids)]
+        if qid not in served:
+            return qid
+    return None
+
+
+def serve(prompt: str, context: Any = None) -> Optional[str]:
+    """
+    Answer a "give me a question on X" or "show the answer" prompt from the bank.
+
+    Never repeats a question within a session. Returns None when the prompt is
+    neither request, no bank is deployed, the topic is not covered, the
+    session has already seen every matching question, or an answer is asked
+    for but the session's last question did not come from the bank; the
+    caller then falls back to the model.
+    """
+    session_id = getattr(context, "session_id", None) or "anonymous"
+    if is_answer_request(prompt):
+        bank = get_bank()
+        with _served_lock:
+            qid = _last_served.get(session_id)
+        if bank is None or qid is None:
+            return None
+        return format_answer(bank.get(qid))
+
+    topic = match_request(prompt)
+    if topic is None:
+        return None
+    bank = get_bank()
+    ids = bank.lookup(topic) if bank is not None else None
+
+    with _served_lock:
+        # A new question was asked for; if the model ends up writing it, its
+        # answer is not in the bank
+        _last_served.pop(session_id, None)
+        if not ids:
+            return None
+        served = _served.setdefault(session_id, set())
+        _served.move_to_end(session_id)
+        while len(_served) > MAX_TRACKED_SESSIONS:
+            evicted, _ = _served.popitem(last=False)
+            _last_served.pop(evicted, None)
+        qid = _pick_unserved(ids, served)
+        if qid is None:
+            return None
+        served.add(qid)
+        _last_served[session_id] = qid
+
+    return format_question(bank.get(qid))
@@ -17,6 +17,10 @@ from strands import Agent
 from strands.models import BedrockModel
 from strands_tools import calculator  # from strands-agents-tools
 
+import diagnostics  # on-demand profiler / memory snapshots (see diagnostics.py)
+import knowledge_base  # local retrieval over reference notes (see build_knowledge_base.py)
+import question_bank  # precomputed practice scenarios (see build_question_bank.py)
+
 
 """
 Phase 2a – SA Pro tutor with a calculator tool (Strands).
@@ -83,6 +87,7 @@ def _build_agent() -> Agent:
 
 
 @app.entrypoint
+@diagnostics.instrumented
 def invoke(payload: Dict[str, Any], context: Optional[RequestContext] = None) -> Dict[str, Any]:
     """
     AgentCore Runtime entrypoint.
@@ -103,8 +108,15 @@ def invoke(payload: Dict[str, Any], context: Optional[RequestContext] = None) ->
             )
         }
 
+    # Fast path: serve "give me a question on X" from the precomputed bank
+    question = question_bank.serve(prompt, context)
+    if question is not None:
+        return {"result": question}
+
+    # Only the most relevant reference-note snippets go into the prompt
     agent = _build_agent()
-    result = agent(prompt)
+    result = agent(knowledge_base.augment_prompt(prompt))
+    diagnostics.record_agent(context, agent)
 
     # Unwrap common Strands result shapes into plain text
     if hasattr(result, "message") and isinstance(result.message, dict):